@@ -1,17 +1,37 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse, Response
+from lxml import etree
 from pptx import Presentation
-from typing import Dict, Any, List
-import tempfile
+from pptx.enum.shapes import MSO_SHAPE_TYPE
+from typing import Dict, Any, List, Set, Tuple
 import os
 import re
-import subprocess
-import json
-import shutil
+import orjson
+import string
+from contextlib import asynccontextmanager
+from functools import lru_cache
 from pathlib import Path
 
-app = FastAPI(title="AIStoryteller Backend")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """启动时检查固定模板、预读文件并预先解析，接口中不再逐次检查文件是否存在"""
+    if not FIXED_TEMPLATE_PATH.exists():
+        raise RuntimeError(f"Fixed template file not found: {FIXED_TEMPLATE_PATH}")
+    prefetch_file(FIXED_TEMPLATE_PATH)
+    fixed_template_json()
+    if FIXED_TEMPLATE_PDF.exists():
+        prefetch_file(FIXED_TEMPLATE_PDF)
+    yield
+
+
+# 解析结果嵌套较深，使用 orjson 序列化以加快大文件的响应
+app = FastAPI(
+    title="AIStoryteller Backend",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
+)
 
 # CORS配置
 app.add_middleware(
@@ -34,11 +54,11 @@ TEMP_DIR.mkdir(exist_ok=True)
 
 # ========== 基础工具函数 ==========
 
+_SHAPE_TYPE_NAMES = {m: m.name for m in MSO_SHAPE_TYPE}
+
+
 def shape_type_to_str(shape_type) -> str:
-    try:
-        return shape_type.name
-    except Exception:
-        return str(shape_type)
+    return _SHAPE_TYPE_NAMES.get(shape_type) or str(shape_type)
 
 
 def safe_int(value, default=0) -> int:
@@ -48,103 +68,206 @@ def safe_int(value, default=0) -> int:
         return default
 
 
+# 直接用 lxml 读取文本，结果与 python-pptx 的 shape.text 一致：
+# 段落之间以 "\n" 分隔，段内换行（a:br）记为 "\v"
+_A_NS = "http://schemas.openxmlformats.org/drawingml/2006/main"
+_P_NS = "http://schemas.openxmlformats.org/presentationml/2006/main"
+_XPATH_NS = {"a": _A_NS, "p": _P_NS}
+_PARAGRAPHS_XPATH = etree.XPath("./p:txBody/a:p", namespaces=_XPATH_NS)
+_CONTENT_XPATH = etree.XPath("./a:r/a:t | ./a:fld/a:t | ./a:br", namespaces=_XPATH_NS)
+_BR_TAG = "{%s}br" % _A_NS
+
+
+def shape_text(shape) -> str:
+    """读取形状文本，避免 python-pptx 逐段落 / 逐 run 构造包装对象"""
+    return "\n".join(
+        "".join("\v" if e.tag == _BR_TAG else (e.text or "") for e in _CONTENT_XPATH(p))
+        for p in _PARAGRAPHS_XPATH(shape.element)
+    )
+
+
+def prefetch_file(path: Path) -> None:
+    """提示内核预读文件到页缓存，首次请求不必等待冷盘读取"""
+    if not hasattr(os, "posix_fadvise"):
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+    finally:
+        os.close(fd)
+
+
 # ========== Slide 分类规则 ==========
 
 AGENDA_KEYWORDS = ["agenda", "contents", "outline", "目录", "议程"]
 ENDING_KEYWORDS = ["thank you", "thanks", "q&a", "questions", "谢谢", "结束"]
 SECTION_KEYWORDS = ["section", "part", "chapter", "模块", "篇", "part "]
 
+# 所有关键词编译为一个带命名分组的正则，一次扫描即可得到命中的类别集合；
+# 使用零宽前瞻，互相重叠的关键词（如 "q&agenda"）也都能命中
+_KEYWORD_RE = re.compile("(?=%s)" % "|".join(
+    "(?P<%s>%s)" % (tag, "|".join(map(re.escape, keywords)))
+    for tag, keywords in (
+        ("agenda", AGENDA_KEYWORDS),
+        ("ending", ENDING_KEYWORDS),
+        ("section", SECTION_KEYWORDS),
+    )
+))
+
+# 列表行识别 / 清理用的预编译正则
+# "-" 单独处理：只有后面跟空白时才算列表符号，避免 "-5%" 之类被误判
+_BULLET_HEADS = frozenset("•·●○▶")
+_ASCII_LETTERS = frozenset(string.ascii_letters)
+# 依次去掉符号 / 数字 / 字母前缀，合并为一次匹配；"-" 与识别规则一致，后跟空白才去掉
+_STRIP_PREFIX_RE = re.compile(
+    r"^(?:[•●○▶]\s*|-[ \t]\s*)?(?:\d+[\.\)]\s*)?(?:[a-zA-Z][\.\)]\s*)?"
+)
+# 只有以这些字符（或数字）开头的行才可能带前缀，其余行无需进入正则
+_STRIP_HEADS = frozenset("•-●○▶") | _ASCII_LETTERS
+
 
 def is_bullet_line(line: str) -> bool:
     line = line.strip()
     if not line:
         return False
-    if line.startswith(("•", "-", "·", "· ", "●", "○", "▶")):
-        return True
-    if re.match(r"^(\d+|[a-zA-Z])[\.\)]\s+", line):
+    return _is_bullet_line_stripped(line)
+
+
+def _is_bullet_line_stripped(line: str) -> bool:
+    r"""is_bullet_line 的内部版本，要求 line 已 strip 且非空
+
+    编号部分按 r"^(\d+|[a-zA-Z])[\.\)]\s+" 的规则逐字符判断，不经过正则引擎
+    （\d 对应 str.isdecimal()，\s 对应 str.isspace()）。
+    """
+    c = line[0]
+    if c in _BULLET_HEADS:
         return True
-    return False
+
+    n = len(line)
+    if c == "-":
+        return n > 1 and line[1] in " \t"
+    if c in _ASCII_LETTERS:
+        i = 1
+    elif c.isdecimal():
+        i = 1
+        while i < n and line[i].isdecimal():
+            i += 1
+    else:
+        return False
+    return i + 1 < n and line[i] in ".)" and line[i + 1].isspace()
+
+
+def strip_bullet_prefix(line: str) -> str:
+    """去掉行首手动输入的列表符号 / 编号"""
+    first = line[:1]
+    # \d 对应 str.isdecimal()
+    if first in _STRIP_HEADS or first.isdecimal():
+        return _STRIP_PREFIX_RE.sub("", line, count=1)
+    return line
+
+
+def count_bullet_lines(text: str) -> Tuple[int, int]:
+    """统计文本的非空行数与列表行数，单次遍历且不生成中间列表"""
+    total = bullets = 0
+    for ln in text.splitlines():
+        ln = ln.strip()
+        if not ln:
+            continue
+        total += 1
+        if _is_bullet_line_stripped(ln):
+            bullets += 1
+    return total, bullets
+
+
+def keyword_hits(text: str) -> Set[str]:
+    """返回文本中命中的关键词类别（"agenda" / "ending" / "section"）"""
+    return {m.lastgroup for m in _KEYWORD_RE.finditer(text)}
 
 
 def classify_slide(slide_dict: Dict[str, Any], meta: Dict[str, Any]) -> str:
     """分类幻灯片类型"""
     layout_name = (slide_dict.get("layout_name") or "").lower()
+
+    # 版式名称即可判定时直接返回，无需统计形状
+    if "title" in layout_name and "agenda" not in layout_name:
+        return "title"
+    if "agenda" in layout_name or "目录" in layout_name:
+        return "agenda"
+
     shapes = slide_dict.get("shapes", [])
     slide_h = meta.get("slide_height_emu") or 1
     slide_w = meta.get("slide_width_emu") or 1
 
-    text_shapes: List[Dict[str, Any]] = []
-    picture_shapes: List[Dict[str, Any]] = []
+    # 单次遍历形状：同时统计文本、列表行并挑选候选大标题
+    texts: List[str] = []
+    has_picture = False
 
     total_text_len = 0
     total_lines = 0
     bullet_lines = 0
 
+    title_candidate = None
+    title_score = -1.0
+
     for s in shapes:
         if s.get("shape_type", "").upper() in ("PICTURE", "MEDIA"):
-            picture_shapes.append(s)
+            has_picture = True
 
-        if s.get("has_text_frame") and s.get("text"):
-            txt = s["text"].strip()
-            if not txt:
-                continue
-            text_shapes.append(s)
-            total_text_len += len(txt)
+        raw = s.get("text")
+        if not (s.get("has_text_frame") and raw):
+            continue
+        txt = raw.strip()
+        if not txt:
+            continue
+        texts.append(raw)
+        total_text_len += len(txt)
 
-            lines = [ln for ln in txt.splitlines() if ln.strip()]
-            total_lines += len(lines)
-            bullet_lines += sum(1 for ln in lines if is_bullet_line(ln))
+        n_lines, n_bullets = count_bullet_lines(txt)
+        total_lines += n_lines
+        bullet_lines += n_bullets
 
-    bullet_ratio = (bullet_lines / total_lines) if total_lines > 0 else 0.0
+        # 过长的文本不可能是标题，先跳过再计算几何得分
+        if len(txt) > 60:
+            continue
 
-    # 提取候选大标题
-    title_candidate = None
-    title_score = -1.0
-    for s in text_shapes:
         geom = s.get("geometry", {})
         top = geom.get("top_emu") or 0
         height = geom.get("height_emu") or 0
-        text = (s.get("text") or "").strip()
 
-        y_center_ratio = (top + height / 2) / slide_h
-        area = (geom.get("width_emu") or 0) * height
-
-        score = area
-        if y_center_ratio < 0.35:
+        score = (geom.get("width_emu") or 0) * height
+        if (top + height / 2) / slide_h < 0.35:
             score *= 1.3
 
-        if score > title_score and 0 < len(text) <= 60:
+        if score > title_score:
             title_score = score
-            title_candidate = text
+            title_candidate = txt
 
-    all_text = " ".join([(s.get("text") or "") for s in text_shapes]).lower()
+    bullet_ratio = (bullet_lines / total_lines) if total_lines > 0 else 0.0
+    n_text_shapes = len(texts)
 
     # 分类规则
-    if "title" in layout_name and "agenda" not in layout_name:
-        return "title"
-    if "agenda" in layout_name or "目录" in layout_name:
-        return "agenda"
-
     if slide_dict.get("index") == 0:
-        if title_candidate and len(text_shapes) <= 3:
+        if title_candidate and n_text_shapes <= 3:
             return "title"
 
-    if len(text_shapes) <= 2 and total_text_len <= 80 and title_candidate:
+    if n_text_shapes <= 2 and total_text_len <= 80 and title_candidate:
         return "title"
 
-    if any(k in all_text for k in AGENDA_KEYWORDS):
-        return "agenda"
-    if bullet_ratio >= 0.5 and any(k in all_text for k in ["agenda", "目录", "contents"]):
+    # 整页文本只在关键词规则中用到，前面的规则命中时不必拼接
+    all_text = " ".join(texts).lower()
+    hits = keyword_hits(all_text)
+
+    if "agenda" in hits:
         return "agenda"
 
-    if len(text_shapes) <= 2 and total_text_len <= 60:
-        if any(k in (title_candidate or "").lower() for k in SECTION_KEYWORDS):
+    if n_text_shapes <= 2 and total_text_len <= 60:
+        if "section" in keyword_hits((title_candidate or "").lower()):
             return "section"
 
-    if any(k in all_text for k in ENDING_KEYWORDS):
+    if "ending" in hits:
         return "ending"
 
-    if picture_shapes and total_text_len <= 120:
+    if has_picture and total_text_len <= 120:
         return "content_image"
 
     if bullet_ratio >= 0.4:
@@ -156,6 +279,25 @@ def classify_slide(slide_dict: Dict[str, Any], meta: Dict[str, Any]) -> str:
     return "other"
 
 
+def shape_to_dict(shape_idx: int, shape) -> Dict[str, Any]:
+    """提取单个形状的基本信息"""
+    # BaseShape 上这些属性总是存在，直接访问即可（位置可能为 None）
+    has_tf = shape.has_text_frame
+    return {
+        "index": shape_idx,
+        "name": shape.name,
+        "shape_type": shape_type_to_str(shape.shape_type),
+        "geometry": {
+            "left_emu": safe_int(shape.left),
+            "top_emu": safe_int(shape.top),
+            "width_emu": safe_int(shape.width),
+            "height_emu": safe_int(shape.height),
+        },
+        "has_text_frame": bool(has_tf),
+        "text": (shape_text(shape).strip() or None) if has_tf else None,
+    }
+
+
 def extract_ppt_structure(prs: Presentation) -> Dict[str, Any]:
     """提取 PPT 结构"""
     meta = {
@@ -170,32 +312,10 @@ def extract_ppt_structure(prs: Presentation) -> Dict[str, Any]:
         slide_dict: Dict[str, Any] = {
             "index": slide_idx,
             "layout_name": slide.slide_layout.name,
-            "shapes": [],
+            # 一次性生成形状列表，避免逐个 append
+            "shapes": [shape_to_dict(i, shape) for i, shape in enumerate(slide.shapes)],
         }
 
-        for shape_idx, shape in enumerate(slide.shapes):
-            geom = {
-                "left_emu": safe_int(getattr(shape, "left", 0)),
-                "top_emu": safe_int(getattr(shape, "top", 0)),
-                "width_emu": safe_int(getattr(shape, "width", 0)),
-                "height_emu": safe_int(getattr(shape, "height", 0)),
-            }
-
-            shape_dict: Dict[str, Any] = {
-                "index": shape_idx,
-                "name": getattr(shape, "name", None),
-                "shape_type": shape_type_to_str(getattr(shape, "shape_type", None)),
-                "geometry": geom,
-                "has_text_frame": bool(getattr(shape, "has_text_frame", False)),
-                "text": None,
-            }
-
-            if getattr(shape, "has_text_frame", False):
-                text = shape.text.strip()
-                shape_dict["text"] = text or None
-
-            slide_dict["shapes"].append(shape_dict)
-
         slide_dict["slide_type"] = classify_slide(slide_dict, meta)
         slides_info.append(slide_dict)
 
@@ -205,6 +325,12 @@ def extract_ppt_structure(prs: Presentation) -> Dict[str, Any]:
     }
 
 
+def parse_pptx(source) -> Dict[str, Any]:
+    """打开 PPTX（路径或文件对象）并提取结构"""
+    prs = Presentation(source)
+    return extract_ppt_structure(prs)
+
+
 # ========== 模板匹配 ==========
 
 def match_template_slide(slide_type: str, slide_index: int, total_slides: int) -> int:
@@ -237,6 +363,12 @@ def match_template_slide(slide_type: str, slide_index: int, total_slides: int) -
     return candidates[idx]
 
 
+@lru_cache(maxsize=64)
+def sorted_shape_keys(keys: Tuple[str, ...]) -> Tuple[str, ...]:
+    """按编号排序模板 shape key（shape-0, shape-1, ...），同一模板页只排序一次"""
+    return tuple(sorted(keys, key=lambda k: int(k.split("-", 1)[1])))
+
+
 def generate_replacement_json(user_slides: List[Dict], template_inventory: Dict) -> Dict:
     """
     生成替换 JSON
@@ -273,8 +405,7 @@ def generate_replacement_json(user_slides: List[Dict], template_inventory: Dict)
         
         # 分配文本到模板 shapes
         # 策略：第一个文本作为标题，其他作为内容
-        shape_keys = sorted(template_shapes.keys(), 
-                          key=lambda k: int(k.split("-")[1]))
+        shape_keys = sorted_shape_keys(tuple(template_shapes))
         
         for i, shape_key in enumerate(shape_keys):
             if i >= len(user_texts):
@@ -288,8 +419,8 @@ def generate_replacement_json(user_slides: List[Dict], template_inventory: Dict)
                        template_shape.get("placeholder_type") in ["TITLE", "CENTER_TITLE"])
             
             # 判断是否为列表
-            lines = [ln.strip() for ln in text.split('\n') if ln.strip()]
-            is_bullet_list = len(lines) > 1 or any(is_bullet_line(ln) for ln in lines)
+            lines = [ln2 for ln in text.split('\n') if (ln2 := ln.strip())]
+            is_bullet_list = len(lines) > 1 or any(_is_bullet_line_stripped(ln) for ln in lines)
             
             paragraphs = []
             
@@ -297,9 +428,7 @@ def generate_replacement_json(user_slides: List[Dict], template_inventory: Dict)
                 # 列表内容
                 for line in lines:
                     # 移除手动的 bullet 符号
-                    clean_line = re.sub(r'^[•\-●○▶]\s*', '', line)
-                    clean_line = re.sub(r'^\d+[\.\)]\s*', '', clean_line)
-                    clean_line = re.sub(r'^[a-zA-Z][\.\)]\s*', '', clean_line)
+                    clean_line = strip_bullet_prefix(line)
                     
                     paragraphs.append({
                         "text": clean_line,
@@ -332,18 +461,12 @@ def health_check():
 @app.post("/api/parse_ppt")
 async def parse_ppt(file: UploadFile = File(...)):
     """解析用户 PPTX"""
-    suffix = ".pptx"
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        contents = await file.read()
-        tmp.write(contents)
-        tmp_path = tmp.name
-
-    try:
-        prs = Presentation(tmp_path)
-        data = extract_ppt_structure(prs)
-        return data
-    finally:
-        os.remove(tmp_path)
+    # UploadFile 底层是 SpooledTemporaryFile（大文件已落盘），直接交给 python-pptx 读取，
+    # 不再把整个上传内容读入内存
+    await file.seek(0)
+    # 解析是同步的 CPU/IO 操作，放到线程池中执行，避免阻塞事件循环
+    data = await run_in_threadpool(parse_pptx, file.file)
+    return data
 
 
 @app.post("/api/beautify_ppt")
@@ -351,10 +474,6 @@ async def beautify_ppt(file: UploadFile = File(...)):
     """
     美化用户 PPTX - 始终返回固定模板
     """
-    # 检查固定模板文件是否存在
-    if not FIXED_TEMPLATE_PATH.exists():
-        raise HTTPException(status_code=500, detail="Fixed template file not found")
-    
     # 直接返回固定模板文件，忽略用户上传的文件
     return FileResponse(
         path=str(FIXED_TEMPLATE_PATH),
@@ -365,17 +484,25 @@ async def beautify_ppt(file: UploadFile = File(...)):
 
 # ========== 固定模板相关接口 ==========
 
+@lru_cache(maxsize=8)
+def _cached_structure_json(path: str, mtime: float) -> bytes:
+    """解析 PPTX 结构并缓存序列化后的 JSON，文件修改时间变化后自动重新解析"""
+    return orjson.dumps(parse_pptx(path))
+
+
+def fixed_template_json() -> bytes:
+    return _cached_structure_json(str(FIXED_TEMPLATE_PATH), FIXED_TEMPLATE_PATH.stat().st_mtime)
+
+
 @app.get("/api/fixed_template_data")
 async def get_fixed_template_data():
     """获取固定模板的解析数据（用于HTML渲染，备用）"""
-    if not FIXED_TEMPLATE_PATH.exists():
+    # 解析结果已在启动时缓存为 JSON；模板更新后需重新解析，放到线程池中避免阻塞事件循环
+    try:
+        content = await run_in_threadpool(fixed_template_json)
+    except FileNotFoundError:
         raise HTTPException(status_code=500, detail="Fixed template file not found")
-    
-    # 解析固定模板
-    prs = Presentation(str(FIXED_TEMPLATE_PATH))
-    data = extract_ppt_structure(prs)
-    
-    return data
+    return Response(content=content, media_type="application/json")
 
 
 @app.get("/api/fixed_template_pdf")
@@ -405,9 +532,6 @@ async def get_fixed_template_pdf():
 @app.get("/fixed_template.pptx")
 async def get_fixed_template():
     """提供固定模板PPTX文件下载"""
-    if not FIXED_TEMPLATE_PATH.exists():
-        raise HTTPException(status_code=404, detail="Fixed template not found")
-    
     return FileResponse(
         path=str(FIXED_TEMPLATE_PATH),
         filename="beautified_presentation.pptx",
@@ -23,13 +23,13 @@ Usage:
 """
 
 import argparse
-import json
 import platform
 import sys
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple, Union
 
+import orjson
 from PIL import Image, ImageDraw, ImageFont
 from pptx import Presentation
 from pptx.enum.text import PP_ALIGN
@@ -1012,8 +1012,9 @@ def save_inventory(inventory: InventoryData, output_path: Path) -> None:
             shape_key: shape_data.to_dict() for shape_key, shape_data in shapes.items()
         }
 
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(json_inventory, f, indent=2, ensure_ascii=False)
+    # orjson always writes UTF-8 (same as ensure_ascii=False) and is much
+    # faster than the stdlib encoder for large inventories
+    output_path.write_bytes(orjson.dumps(json_inventory, option=orjson.OPT_INDENT_2))
 
 
 if __name__ == "__main__":
@@ -10,7 +10,6 @@ Slides can be repeated (e.g., 34 appears twice).
 """
 
 import argparse
-import shutil
 import sys
 from copy import deepcopy
 from pathlib import Path
@@ -154,13 +153,14 @@ def rearrange_presentation(template_path, output_path, slide_sequence):
         template_path: Path to template PPTX file
         output_path: Path for output PPTX file
         slide_sequence: List of slide indices (0-based) to include
+
+    Returns:
+        The rearranged Presentation, so callers can keep working on it
+        without re-opening output_path.
     """
-    # Copy template to preserve dimensions and theme
-    if template_path != output_path:
-        shutil.copy2(template_path, output_path)
-        prs = Presentation(output_path)
-    else:
-        prs = Presentation(template_path)
+    # Open the template directly; save() writes the whole package, so
+    # dimensions and theme are preserved without copying the file first
+    prs = Presentation(template_path)
 
     total_slides = len(prs.slides)
 
@@ -226,6 +226,8 @@ def rearrange_presentation(template_path, output_path, slide_sequence):
     print(f"\nSaved rearranged presentation to: {output_path}")
     print(f"Final presentation has {len(prs.slides)} slides")
 
+    return prs
+
 
 if __name__ == "__main__":
     main()
@@ -12,7 +12,7 @@ unless "paragraphs" is specified in the replacements for that shape.
 import json
 import sys
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 from inventory import InventoryData, extract_text_inventory
 from pptx import Presentation
@@ -214,8 +214,31 @@ def check_duplicate_keys(pairs):
 def apply_replacements(pptx_file: str, json_file: str, output_file: str):
     """Apply text replacements from JSON to PowerPoint presentation."""
 
+    # Load replacement data with duplicate key detection
+    with open(json_file, "r") as f:
+        replacements = json.load(f, object_pairs_hook=check_duplicate_keys)
+
+    apply_replacements_dict(pptx_file, replacements, output_file)
+
+
+def apply_replacements_dict(
+    pptx_file: str, replacements: Dict, output_file: str, prs: Optional[Any] = None
+):
+    """Apply text replacements given as an in-memory dict to PowerPoint presentation.
+
+    The dict has the same structure as the replacements JSON file, so callers
+    that build it in Python can skip the JSON round trip through disk.
+
+    Args:
+        pptx_file: Path to the PowerPoint file
+        replacements: Replacement data keyed by slide-N / shape-N
+        output_file: Path for the updated PowerPoint file
+        prs: Optional Presentation object to use. If not provided, will load from pptx_file.
+    """
+
     # Load presentation
-    prs = Presentation(pptx_file)
+    if prs is None:
+        prs = Presentation(pptx_file)
 
     # Get inventory of all text shapes (returns ShapeData objects)
     # Pass prs to use same Presentation instance
@@ -224,10 +247,6 @@ def apply_replacements(pptx_file: str, json_file: str, output_file: str):
     # Detect text overflow in original presentation
     original_overflow = detect_frame_overflow(inventory)
 
-    # Load replacement data with duplicate key detection
-    with open(json_file, "r") as f:
-        replacements = json.load(f, object_pairs_hook=check_duplicate_keys)
-
     # Validate replacements
     errors = validate_replacements(inventory, replacements)
     if errors:
@@ -227,7 +227,6 @@ def convert_to_images(pptx_path, temp_dir, dpi):
             str(pptx_path),
         ],
         capture_output=True,
-        text=True,
     )
     if result.returncode != 0 or not pdf_path.exists():
         raise RuntimeError("PDF conversion failed")
@@ -237,7 +236,6 @@ def convert_to_images(pptx_path, temp_dir, dpi):
     result = subprocess.run(
         ["pdftoppm", "-jpeg", "-r", str(dpi), str(pdf_path), str(temp_dir / "slide")],
         capture_output=True,
-        text=True,
     )
     if result.returncode != 0:
         raise RuntimeError("Image conversion failed")
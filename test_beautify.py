@@ -6,16 +6,22 @@
     python test_beautify.py input.pptx
 """
 
+import shutil
 import sys
-import subprocess
-import json
+import tempfile
 from pathlib import Path
 
-# 添加当前目录到 Python 路径
+# 添加当前目录和脚本目录到 Python 路径
 sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, str(Path(__file__).parent / "pptx_skills" / "scripts"))
 
 from pptx import Presentation
 
+# 直接调用脚本中的函数，避免每一步都启动新的 Python 进程
+from inventory import extract_text_inventory
+from rearrange import rearrange_presentation
+from replace import apply_replacements_dict
+
 def test_beautify(input_pptx):
     """测试完整的美化流程"""
     
@@ -24,7 +30,6 @@ def test_beautify(input_pptx):
     print("=" * 60)
     
     # 配置路径
-    SCRIPTS_DIR = Path("pptx_skills/scripts")
     TEMPLATE_PATH = Path("templates/TeamsPPTTemplate.pptx")
     TEMP_DIR = Path("temp")
     
@@ -61,41 +66,28 @@ def test_beautify(input_pptx):
     
     # 步骤 3: 重排模板
     print("\n[3/6] 重排模板页面...")
-    working_pptx = TEMP_DIR / "working.pptx"
-    sequence_str = ",".join(map(str, template_sequence))
-    
-    cmd = [
-        "python",
-        str(SCRIPTS_DIR / "rearrange.py"),
-        str(TEMPLATE_PATH),
-        str(working_pptx),
-        sequence_str
-    ]
-    
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        print(f"   ❌ 失败: {result.stderr}")
+    # 每次运行使用独立的临时目录，多个流程并发时不会互相覆盖文件
+    run_dir = Path(tempfile.mkdtemp(prefix="beautify_", dir=TEMP_DIR))
+    working_pptx = run_dir / "working.pptx"
+    
+    try:
+        # 保留重排后的 Presentation 对象，后续步骤无需重新解析 working.pptx
+        working_prs = rearrange_presentation(TEMPLATE_PATH, working_pptx, template_sequence)
+    except Exception as e:
+        print(f"   ❌ 失败: {e}")
+        shutil.rmtree(run_dir, ignore_errors=True)
         return
     print(f"   ✓ 完成")
     
     # 步骤 4: 提取 inventory
     print("\n[4/6] 提取模板结构...")
-    inventory_json = TEMP_DIR / "inventory.json"
-    
-    cmd = [
-        "python",
-        str(SCRIPTS_DIR / "inventory.py"),
-        str(working_pptx),
-        str(inventory_json)
-    ]
-    
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        print(f"   ❌ 失败: {result.stderr}")
-        return
     
-    with open(inventory_json, "r", encoding="utf-8") as f:
-        inventory = json.load(f)
+    try:
+        inventory = extract_text_inventory(working_pptx, working_prs)
+    except Exception as e:
+        print(f"   ❌ 失败: {e}")
+        shutil.rmtree(run_dir, ignore_errors=True)
+        return
     print(f"   ✓ 找到 {len(inventory)} 页，{sum(len(v) for v in inventory.values())} 个形状")
     
     # 步骤 5: 生成替换 JSON（简化版）
@@ -123,28 +115,21 @@ def test_beautify(input_pptx):
                 }
                 break
     
-    replacement_json = TEMP_DIR / "replacement.json"
-    with open(replacement_json, "w", encoding="utf-8") as f:
-        json.dump(replacement, f, ensure_ascii=False, indent=2)
     print(f"   ✓ 生成替换内容")
     
     # 步骤 6: 应用替换
     print("\n[6/6] 应用替换...")
-    output_pptx = TEMP_DIR / "output.pptx"
-    
-    cmd = [
-        "python",
-        str(SCRIPTS_DIR / "replace.py"),
-        str(working_pptx),
-        str(replacement_json),
-        str(output_pptx)
-    ]
-    
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        print(f"   ❌ 失败: {result.stderr}")
+    output_pptx = run_dir / "output.pptx"
+    
+    try:
+        apply_replacements_dict(str(working_pptx), replacement, str(output_pptx), working_prs)
+    except Exception as e:
+        print(f"   ❌ 失败: {e}")
+        shutil.rmtree(run_dir, ignore_errors=True)
         return
     
+    # 只保留最终输出，删除中间文件
+    working_pptx.unlink(missing_ok=True)
     print(f"   ✓ 完成")
     print("\n" + "=" * 60)
     print(f"✅ 美化成功！输出文件: {output_pptx}")